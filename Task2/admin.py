@@ -1,11 +1,10 @@
 import streamlit as st
-import os
+from math import ceil
 import pandas as pd
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from pymongo import MongoClient
-from bson import ObjectId
+from db import get_feedback_collection
 
 st.set_page_config(
     page_title="Admin Dashboard",
@@ -13,63 +12,183 @@ st.set_page_config(
     layout="wide"
 )
 
-MONGODB_URI = os.getenv("MONGODB_URI")
-DB_NAME = "fynd"  
-COLLECTION_NAME = "user_feedback"    
+PAGE_SIZE = 50
 
+FEEDBACK_PROJECTION = {
+    "_id": 0,
+    "timestamp": 1,
+    "rating": 1,
+    "review": 1,
+    "ai_summary": 1,
+    "ai_response": 1,
+    "ai_actions": 1
+}
 
-def get_mongo_client():
-    """Get MongoDB client with proper error handling"""
-    try:
-        mongodb_uri = st.secrets.get("MONGODB_URI") or os.getenv("MONGODB_URI")
-    except:
-        mongodb_uri = os.getenv("MONGODB_URI")
-    
-    if not mongodb_uri:
-        st.error("⚠️ MONGODB_URI not found. Please set it in your environment variables or Streamlit secrets.")
-        st.stop()
-    
-    return MongoClient(mongodb_uri)
+EXPORT_DTYPES = {
+    "timestamp": "datetime64[ns]",
+    "rating": "int8",
+    "review": "string",
+    "ai_summary": "string",
+    "ai_response": "string",
+    "ai_actions": "string"
+}
 
-def get_database():
-    """Get MongoDB database connection"""
-    client = get_mongo_client()
-    return client[DB_NAME]
+SORT_OPTIONS = {
+    "Newest First": [("timestamp", -1), ("_id", -1)],
+    "Oldest First": [("timestamp", 1), ("_id", 1)],
+    "Highest Rating": [("rating", -1), ("timestamp", -1), ("_id", -1)],
+    "Lowest Rating": [("rating", 1), ("timestamp", -1), ("_id", -1)]
+}
 
-def get_feedback_collection():
-    """Get feedback collection using the defined COLLECTION_NAME"""
-    db = get_database()
-    return db[COLLECTION_NAME]
 
-def load_data():
-    """Load all feedback from MongoDB"""
+@st.cache_resource(show_spinner=False)
+def ensure_indexes():
+    """Create the indexes backing the dashboard queries once per process"""
     collection = get_feedback_collection()
-    return list(collection.find())
+    collection.create_index([("rating", 1), ("timestamp", -1), ("_id", -1)])
+    collection.create_index([("rating", -1), ("timestamp", -1), ("_id", -1)])
+    collection.create_index([("timestamp", -1), ("_id", -1)])
 
-def get_dataframe():
-    """Convert feedback data to pandas DataFrame"""
-    data = load_data()
-    if not data:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(data)
-    if 'timestamp' in df.columns:
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
-    return df
+@st.cache_data(ttl=30, show_spinner=False)
+def get_kpis():
+    """Compute the key metrics in a single server-side aggregation"""
+    collection = get_feedback_collection()
+    result = next(collection.aggregate([
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "avg_rating": {"$avg": "$rating"},
+            "positive": {"$sum": {"$cond": [{"$gte": ["$rating", 4]}, 1, 0]}},
+            "negative": {"$sum": {"$cond": [{"$lte": ["$rating", 2]}, 1, 0]}}
+        }}
+    ]), None)
+    return result or {"total": 0, "avg_rating": 0, "positive": 0, "negative": 0}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_rating_counts():
+    """Count submissions per star rating on the server"""
+    collection = get_feedback_collection()
+    return {
+        doc["_id"]: doc["count"]
+        for doc in collection.aggregate([
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ])
+    }
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_daily_counts():
+    """Count submissions per day on the server, skipping ones without a date timestamp"""
+    collection = get_feedback_collection()
+    return {
+        doc["_id"]: doc["count"]
+        for doc in collection.aggregate([
+            {"$match": {"timestamp": {"$type": "date"}}},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}},
+                "count": {"$sum": 1}
+            }},
+            {"$sort": {"_id": 1}}
+        ])
+    }
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_feedback(ratings, sort_by, limit=0, skip=0):
+    """Load feedback for the selected ratings, filtered, sorted, paged and projected by MongoDB"""
+    collection = get_feedback_collection()
+    cursor = collection.find(
+        {"rating": {"$in": list(ratings)}},
+        FEEDBACK_PROJECTION
+    ).sort(SORT_OPTIONS[sort_by]).skip(skip).limit(limit)
+    return list(cursor)
+
+def get_export_frame(ratings, sort_by):
+    """Build the export DataFrame with declared column dtypes instead of inferring them"""
+    rows = load_feedback(ratings, sort_by)
+    df = pd.DataFrame(rows, columns=list(EXPORT_DTYPES))
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    return df.astype(EXPORT_DTYPES)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def export_csv(ratings, sort_by):
+    """Serialize every submission matching the filter to CSV, once per filter change"""
+    return get_export_frame(ratings, sort_by).to_csv(index=False).encode()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def export_json(ratings, sort_by):
+    """Serialize every submission matching the filter to JSON, once per filter change"""
+    df = get_export_frame(ratings, sort_by)
+    return df.to_json(orient='records', indent=2, default_handler=str).encode()
+
+@st.cache_data(show_spinner=False)
+def build_rating_chart(rating_counts):
+    """Build the rating distribution bar chart, reused while the counts are unchanged"""
+    fig = px.bar(
+        x=list(rating_counts.keys()),
+        y=list(rating_counts.values()),
+        labels={'x': 'Rating (Stars)', 'y': 'Count'},
+        title='Rating Distribution',
+        color=list(rating_counts.keys()),
+        color_continuous_scale='RdYlGn'
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_timeline_chart(daily_counts):
+    """Build the submissions-over-time line chart, reused while the counts are unchanged"""
+    fig = px.line(
+        x=list(daily_counts.keys()),
+        y=list(daily_counts.values()),
+        title='Feedback Submissions Over Time',
+        markers=True
+    )
+    fig.update_layout(
+        xaxis_title='Date',
+        yaxis_title='Number of Submissions'
+    )
+    return fig
+
+def build_gauge_chart(avg_rating):
+    """Build the overall satisfaction gauge"""
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=avg_rating,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "Overall Satisfaction"},
+        gauge={
+            'axis': {'range': [0, 5]},
+            'bar': {'color': "darkblue"},
+            'steps': [
+                {'range': [0, 2], 'color': "lightcoral"},
+                {'range': [2, 3.5], 'color': "lightyellow"},
+                {'range': [3.5, 5], 'color': "lightgreen"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 4
+            }
+        }
+    ))
+    fig.update_layout(height=300)
+    return fig
 
 def main():
     st.title("📊 Admin Dashboard")
     st.write("Monitor and analyze customer feedback in real-time")
     
     if st.button("🔄 Refresh Data"):
+        st.cache_data.clear()
+        st.session_state.pop("export_key", None)
         st.rerun()
     
-    st.caption("Dashboard updates automatically. Click refresh for manual update.")
+    st.caption("Data may be up to 30 seconds old. Click refresh for the latest submissions.")
     
-    df = get_dataframe()
+    ensure_indexes()
+    kpis = get_kpis()
     
-    if df.empty:
+    if kpis['total'] == 0:
         st.info("📭 No feedback submissions yet. Waiting for customer reviews...")
         return
     
@@ -77,19 +196,17 @@ def main():
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Submissions", len(df))
+        st.metric("Total Submissions", kpis['total'])
     
     with col2:
-        avg_rating = df['rating'].mean()
-        st.metric("Average Rating", f"{avg_rating:.2f} ⭐")
+        st.metric("Average Rating", f"{kpis['avg_rating']:.2f} ⭐")
     
     with col3:
-        positive_feedback = len(df[df['rating'] >= 4])
-        positive_pct = (positive_feedback / len(df)) * 100 if len(df) > 0 else 0
+        positive_pct = (kpis['positive'] / kpis['total']) * 100
         st.metric("Positive Feedback", f"{positive_pct:.1f}%")
     
     with col4:
-        negative_feedback = len(df[df['rating'] <= 2])
+        negative_feedback = kpis['negative']
         st.metric("Negative Feedback", negative_feedback, 
                  delta=f"{negative_feedback} need attention", 
                  delta_color="inverse")
@@ -98,68 +215,26 @@ def main():
     
     st.header("📊 Analytics")
     
+    rating_counts = get_rating_counts()
+    
     col1, col2 = st.columns(2)
     
     with col1:
-        rating_counts = df['rating'].value_counts().sort_index()
-        fig_ratings = px.bar(
-            x=rating_counts.index,
-            y=rating_counts.values,
-            labels={'x': 'Rating (Stars)', 'y': 'Count'},
-            title='Rating Distribution',
-            color=rating_counts.index,
-            color_continuous_scale='RdYlGn'
-        )
-        fig_ratings.update_layout(showlegend=False)
-        st.plotly_chart(fig_ratings, use_container_width=True)
+        st.plotly_chart(build_rating_chart(rating_counts), use_container_width=True)
     
     with col2:
-        feedback_by_date = df.groupby('date').size().reset_index(name='count')
-        fig_timeline = px.line(
-            feedback_by_date,
-            x='date',
-            y='count',
-            title='Feedback Submissions Over Time',
-            markers=True
-        )
-        fig_timeline.update_layout(
-            xaxis_title='Date',
-            yaxis_title='Number of Submissions'
-        )
-        st.plotly_chart(fig_timeline, use_container_width=True)
+        st.plotly_chart(build_timeline_chart(get_daily_counts()), use_container_width=True)
     
     col1, col2, col3 = st.columns(3)
     
     with col2:
-        avg_rating = df['rating'].mean()
-        fig_gauge = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=avg_rating,
-            domain={'x': [0, 1], 'y': [0, 1]},
-            title={'text': "Overall Satisfaction"},
-            gauge={
-                'axis': {'range': [0, 5]},
-                'bar': {'color': "darkblue"},
-                'steps': [
-                    {'range': [0, 2], 'color': "lightcoral"},
-                    {'range': [2, 3.5], 'color': "lightyellow"},
-                    {'range': [3.5, 5], 'color': "lightgreen"}
-                ],
-                'threshold': {
-                    'line': {'color': "red", 'width': 4},
-                    'thickness': 0.75,
-                    'value': 4
-                }
-            }
-        ))
-        fig_gauge.update_layout(height=300)
-        st.plotly_chart(fig_gauge, use_container_width=True)
+        st.plotly_chart(build_gauge_chart(kpis['avg_rating']), use_container_width=True)
     
     st.markdown("---")
     
     st.header("🔍 Feedback Submissions")
     
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns([2, 2, 1])
     with col1:
         filter_rating = st.multiselect(
             "Filter by Rating",
@@ -170,25 +245,24 @@ def main():
     with col2:
         sort_by = st.selectbox(
             "Sort by",
-            options=["Newest First", "Oldest First", "Highest Rating", "Lowest Rating"]
+            options=list(SORT_OPTIONS)
         )
     
-    filtered_df = df[df['rating'].isin(filter_rating)]
+    matching = sum(rating_counts.get(rating, 0) for rating in filter_rating)
+    total_pages = max(1, ceil(matching / PAGE_SIZE))
     
-    if sort_by == "Newest First":
-        filtered_df = filtered_df.sort_values('timestamp', ascending=False)
-    elif sort_by == "Oldest First":
-        filtered_df = filtered_df.sort_values('timestamp', ascending=True)
-    elif sort_by == "Highest Rating":
-        filtered_df = filtered_df.sort_values('rating', ascending=False)
-    elif sort_by == "Lowest Rating":
-        filtered_df = filtered_df.sort_values('rating', ascending=True)
+    with col3:
+        page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1)
+    
+    page_rows = load_feedback(filter_rating, sort_by, PAGE_SIZE, (page - 1) * PAGE_SIZE)
     
-    st.write(f"Showing {len(filtered_df)} of {len(df)} submissions")
+    st.write(f"Showing {len(page_rows)} of {matching} matching submissions ({kpis['total']} total) - page {page} of {total_pages}")
     
-    for idx, row in filtered_df.iterrows():
+    for row in page_rows:
+        timestamp = row.get('timestamp')
+        submitted_at = timestamp.strftime('%Y-%m-%d %H:%M:%S') if isinstance(timestamp, datetime) else "unknown time"
         with st.expander(
-            f"⭐ {row['rating']} stars - {row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}",
+            f"⭐ {row['rating']} stars - {submitted_at}",
             expanded=False
         ):
             col1, col2 = st.columns([2, 1])
@@ -222,21 +296,25 @@ def main():
     st.header("💾 Export Data")
     col1, col2 = st.columns(2)
     
+    export_key = (tuple(filter_rating), sort_by, kpis['total'])
+    if st.session_state.get("export_key") != export_key:
+        st.session_state["export_key"] = export_key
+        st.session_state["export_ts"] = datetime.now().strftime('%Y%m%d_%H%M%S')
+    export_ts = st.session_state["export_ts"]
+    
     with col1:
-        csv_data = filtered_df.to_csv(index=False)
         st.download_button(
             label="📥 Download as CSV",
-            data=csv_data,
-            file_name=f"feedback_data_{datetime.now().strftime('%Y%m%d')}.csv",
+            data=lambda: export_csv(filter_rating, sort_by),
+            file_name=f"feedback_data_{export_ts}.csv",
             mime="text/csv"
         )
     
     with col2:
-        json_data = filtered_df.to_json(orient='records', indent=2, default_handler=str)
         st.download_button(
             label="📥 Download as JSON",
-            data=json_data,
-            file_name=f"feedback_data_{datetime.now().strftime('%Y%m%d')}.json",
+            data=lambda: export_json(filter_rating, sort_by),
+            file_name=f"feedback_data_{export_ts}.json",
             mime="application/json"
         )
 
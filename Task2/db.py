@@ -0,0 +1,46 @@
+import streamlit as st
+import os
+from pymongo import MongoClient
+from pymongo.server_api import ServerApi
+
+DB_NAME = "fynd"
+COLLECTION_NAME = "user_feedback"
+
+
+@st.cache_resource(show_spinner=False)
+def create_mongo_client(mongodb_uri):
+    """Create a pooled MongoDB client, shared across reruns and sessions for the same URI"""
+    client = MongoClient(
+        mongodb_uri,
+        maxPoolSize=50,
+        minPoolSize=5,
+        serverSelectionTimeoutMS=5000,
+        retryWrites=True,
+        appname="fynd-feedback",
+        server_api=ServerApi("1")
+    )
+    client.admin.command("ping")
+    return client
+
+def get_mongo_client():
+    """Get MongoDB client with proper error handling"""
+    try:
+        mongodb_uri = st.secrets.get("MONGODB_URI") or os.getenv("MONGODB_URI")
+    except:
+        mongodb_uri = os.getenv("MONGODB_URI")
+
+    if not mongodb_uri:
+        st.error("⚠️ MONGODB_URI not found. Please set it in your environment variables or Streamlit secrets.")
+        st.stop()
+
+    return create_mongo_client(mongodb_uri)
+
+def get_database():
+    """Get MongoDB database connection"""
+    client = get_mongo_client()
+    return client[DB_NAME]
+
+def get_feedback_collection():
+    """Get feedback collection using the defined COLLECTION_NAME"""
+    db = get_database()
+    return db[COLLECTION_NAME]
@@ -0,0 +1,61 @@
+"""Import feedback saved by the JSON-file version of the app into MongoDB.
+
+Usage: python Task2/import_feedback.py [path/to/feedback_data.json]
+"""
+import json
+import os
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from db import DB_NAME, COLLECTION_NAME
+
+load_dotenv()
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feedback_data.json")
+BATCH_SIZE = 1000
+
+
+def load_entries(path):
+    """Load feedback entries from a JSON file, converting timestamps to datetimes"""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    for entry in entries:
+        if isinstance(entry.get("timestamp"), str):
+            entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+        entry.pop("id", None)
+    return entries
+
+def save_many(collection, entries):
+    """Upsert feedback entries on (timestamp, review) in unordered batches, skipping ones already imported"""
+    inserted = 0
+    for start in range(0, len(entries), BATCH_SIZE):
+        batch = [
+            UpdateOne(
+                {"timestamp": entry["timestamp"], "review": entry["review"]},
+                {"$setOnInsert": entry},
+                upsert=True
+            )
+            for entry in entries[start:start + BATCH_SIZE]
+        ]
+        result = collection.bulk_write(batch, ordered=False)
+        inserted += result.upserted_count
+    return inserted
+
+def main():
+    mongodb_uri = os.getenv("MONGODB_URI")
+    if not mongodb_uri:
+        print("⚠️ MONGODB_URI not found. Please set it in your environment variables.")
+        sys.exit(1)
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    entries = load_entries(path)
+
+    client = MongoClient(mongodb_uri)
+    collection = client[DB_NAME][COLLECTION_NAME]
+    inserted = save_many(collection, entries)
+    print(f"Imported {inserted} of {len(entries)} feedback entries from {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Convert ISO-string timestamps from older submissions to BSON dates.
+
+Strings MongoDB cannot parse are set to null, which the dashboard shows as an unknown time.
+
+Usage: python Task2/migrate_timestamps.py
+"""
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from db import DB_NAME, COLLECTION_NAME
+
+load_dotenv()
+
+
+def migrate(collection):
+    """Convert string timestamps in place on the server, nulling unparseable ones"""
+    result = collection.update_many(
+        {"timestamp": {"$type": "string"}},
+        [{"$set": {"timestamp": {
+            "$convert": {"input": "$timestamp", "to": "date", "onError": None}
+        }}}]
+    )
+    return result.modified_count
+
+def main():
+    mongodb_uri = os.getenv("MONGODB_URI")
+    if not mongodb_uri:
+        print("⚠️ MONGODB_URI not found. Please set it in your environment variables.")
+        sys.exit(1)
+
+    client = MongoClient(mongodb_uri)
+    collection = client[DB_NAME][COLLECTION_NAME]
+    migrated = migrate(collection)
+    print(f"Migrated {migrated} string timestamps")
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,84 @@
 import streamlit as st
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from groq import Groq
-from pymongo import MongoClient
-from bson.json_util import default
+from db import get_database, get_feedback_collection
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 st.set_page_config(
     page_title="Customer Feedback System",
     page_icon="⭐",
     layout="centered"
 )
 
-MONGODB_URI = os.getenv("MONGODB_URI")
-DB_NAME = "fynd"  
-COLLECTION_NAME = "user_feedback"    
+LLM_CACHE_COLLECTION_NAME = "llm_cache"
+LLM_CACHE_TTL = 7 * 24 * 3600
+RESPONSE_MODEL = "llama-3.3-70b-versatile"
+INSIGHTS_MODEL = "llama-3.1-8b-instant"
+GROQ_MAX_RETRIES = 3
+FEEDBACK_CACHE_SIZE = 1024
+FEEDBACK_CACHE_TTL = 3600
+SEMANTIC_CACHE_COLLECTION_NAME = "feedback_cache"
+SEMANTIC_CACHE_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.9
+SEMANTIC_CACHE_SIZE = 5000
+SEMANTIC_CACHE_TTL = 7 * 24 * 3600
 
+RESPONSE_PROMPT = """You are a customer service AI. Reply to the customer feedback below in 2-3 warm, professional sentences that thank them and address their specific concerns or praise.
+
+Rating: {rating}/5 stars
+Review: {review}
+
+Response:"""
+
+INSIGHTS_PROMPT = """Analyze the customer feedback below for the business. Return a JSON object with exactly these keys:
+- "summary": one sentence, max 15 words
+- "actions": array of 2-3 specific, practical next steps, max 12 words each
+
+Rating: {rating}/5 stars
+Review: {review}"""
+
+FALLBACK_RESPONSE = "Thank you for your feedback! We appreciate you taking the time to share your experience with us."
+FALLBACK_SUMMARY = "Customer feedback received"
+FALLBACK_ACTIONS = "• Review and address customer feedback\n• Follow up with customer if needed"
 
-def get_mongo_client():
-    """Get MongoDB client with proper error handling"""
-    try:
-        mongodb_uri = st.secrets.get("MONGODB_URI") or os.getenv("MONGODB_URI")
-    except:
-        mongodb_uri = os.getenv("MONGODB_URI")
-    
-    if not mongodb_uri:
-        st.error("⚠️ MONGODB_URI not found. Please set it in your environment variables or Streamlit secrets.")
-        st.stop()
-    
-    return MongoClient(mongodb_uri)
 
-def get_database():
-    """Get MongoDB database connection"""
-    client = get_mongo_client()
-    return client[DB_NAME]
+def get_llm_cache_collection():
+    """Get the collection of cached Groq completions keyed by model and prompt"""
+    db = get_database()
+    return db[LLM_CACHE_COLLECTION_NAME]
 
-def get_feedback_collection():
-    """Get feedback collection using the defined COLLECTION_NAME"""
+def get_semantic_cache_collection():
+    """Get the collection of review embeddings and the texts generated for them"""
     db = get_database()
-    return db[COLLECTION_NAME]
+    return db[SEMANTIC_CACHE_COLLECTION_NAME]
+
+@st.cache_resource(show_spinner=False)
+def ensure_indexes():
+    """Create the TTL indexes that expire cached completions and embeddings on the background pool, once per process"""
+    submit_write(get_llm_cache_collection().create_index, "created_at", expireAfterSeconds=LLM_CACHE_TTL)
+    submit_write(get_semantic_cache_collection().create_index, "created_at", expireAfterSeconds=SEMANTIC_CACHE_TTL)
+
+@st.cache_resource(show_spinner=False)
+def create_groq_client(api_key):
+    """Create a Groq client whose keep-alive connection pool is shared across reruns and sessions"""
+    return Groq(api_key=api_key, max_retries=GROQ_MAX_RETRIES)
 
 def get_groq_client():
+    """Get Groq client with proper error handling"""
     try:
         api_key = st.secrets["GROQ_API_KEY"]
     except (KeyError, FileNotFoundError):
@@ -52,91 +88,249 @@ def get_groq_client():
         st.error("⚠️ GROQ_API_KEY not found. Please set it in your environment variables or Streamlit secrets.")
         st.stop()
     
-    return Groq(api_key=api_key)
+    return create_groq_client(api_key)
 
-def load_data():
-    """Load all feedback from MongoDB"""
-    collection = get_feedback_collection()
-    return list(collection.find().sort("_id", -1))
+@st.cache_resource(show_spinner=False)
+def get_write_pool():
+    """Get the process-wide thread pool for fire-and-forget cache writes"""
+    return ThreadPoolExecutor(max_workers=4)
+
+def log_write_failure(future):
+    """Log the error of a background write, if it raised one"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Background write failed", exc_info=future.exception())
+
+def submit_write(write, *args, **kwargs):
+    """Run a MongoDB write on the background pool without waiting for it"""
+    get_write_pool().submit(write, *args, **kwargs).add_done_callback(log_write_failure)
 
 def save_data(feedback_entry):
-    """Save feedback entry to MongoDB"""
+    """Save feedback entry to MongoDB, waiting for the insert so a submission is never reported saved but lost"""
     collection = get_feedback_collection()
     result = collection.insert_one(feedback_entry)
     return result.inserted_id
 
-def generate_ai_response(rating, review):
-    client = get_groq_client()
-    
-    prompt = f"""You are a customer service AI. A customer has left the following feedback:
+async def stream_completion(client, model, prompt, placeholder, **params):
+    """Stream a Groq chat completion into a placeholder as tokens arrive and return the full text"""
+    stream = await asyncio.to_thread(
+        client.chat.completions.create,
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+        **params
+    )
+    chunks = iter(stream)
+    content = ""
+    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+        if chunk.choices and chunk.choices[0].delta.content:
+            content += chunk.choices[0].delta.content
+            placeholder.info(f"**Our Response:**\n\n{content}")
+    return content
 
-Rating: {rating}/5 stars
-Review: {review}
+async def cached_completion(client, model, prompt, parse=str.strip, placeholder=None, **params):
+    """Run a Groq chat completion, reusing the stored output of an identical model and prompt; misses stream into placeholder if given"""
+    key = hashlib.sha256((model + prompt).encode()).hexdigest()
+    cache = get_llm_cache_collection()
+    
+    cached = await asyncio.to_thread(cache.find_one, {"_id": key})
+    if cached:
+        return parse(cached["content"])
+    
+    if placeholder is None:
+        completion = await asyncio.to_thread(
+            client.chat.completions.create,
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **params
+        )
+        content = completion.choices[0].message.content
+    else:
+        content = await stream_completion(client, model, prompt, placeholder, **params)
+    result = parse(content)
+    
+    ensure_indexes()
+    submit_write(
+        cache.update_one,
+        {"_id": key},
+        {"$setOnInsert": {"model": model, "content": content, "created_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return result
 
-Generate a personalized, empathetic response to this customer. The response should:
-1. Thank them for their feedback
-2. Address their specific concerns or praise
-3. Be warm and professional
-4. Be concise (2-3 sentences)
+def parse_insights(content):
+    """Extract the summary and bullet-point actions from a JSON-mode insights completion"""
+    insights = json.loads(content)
+    actions = insights["actions"]
+    if isinstance(actions, str):
+        actions = [actions]
+    return insights["summary"].strip(), "\n".join(f"• {action.strip()}" for action in actions)
 
-Response:"""
+async def generate_ai_response(client, rating, review, placeholder=None, model=RESPONSE_MODEL):
+    prompt = RESPONSE_PROMPT.format(rating=rating, review=review)
 
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
+        return await cached_completion(
+            client,
+            model,
+            prompt,
+            placeholder=placeholder,
             temperature=0.7,
-            max_tokens=200
+            max_tokens=120,
+            stop=["\n\n\n"]
         )
-        return completion.choices[0].message.content.strip()
     except Exception as e:
         st.warning(f"AI response generation failed: {str(e)}")
-        return "Thank you for your feedback! We appreciate you taking the time to share your experience with us."
-
-def generate_summary(review):
-    client = get_groq_client()
-    
-    prompt = f"""Summarize the following customer review in one concise sentence (max 15 words):
-
-Review: {review}
+        return FALLBACK_RESPONSE
 
-Summary:"""
+async def generate_insights(client, rating, review, model=INSIGHTS_MODEL):
+    """Generate the admin summary and recommended actions in a single JSON-mode call"""
+    prompt = INSIGHTS_PROMPT.format(rating=rating, review=review)
 
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
+        return await cached_completion(
+            client,
+            model,
+            prompt,
+            parse=parse_insights,
             temperature=0.5,
-            max_tokens=50
+            max_tokens=120,
+            response_format={"type": "json_object"}
         )
-        return completion.choices[0].message.content.strip()
     except Exception as e:
-        st.warning(f"Summary generation failed: {str(e)}")
-        return "Customer feedback received"
+        st.warning(f"Insights generation failed: {str(e)}")
+        return FALLBACK_SUMMARY, FALLBACK_ACTIONS
 
-def generate_actions(rating, review):
+async def generate_all(rating, review, response_placeholder=None):
+    """Run the response and insights Groq calls concurrently over the shared client"""
     client = get_groq_client()
-    
-    prompt = f"""Based on this customer feedback, suggest 2-3 specific actionable next steps for the business:
+    ai_response, (ai_summary, ai_actions) = await asyncio.gather(
+        generate_ai_response(client, rating, review, response_placeholder),
+        generate_insights(client, rating, review)
+    )
+    return ai_response, ai_summary, ai_actions
 
-Rating: {rating}/5 stars
-Review: {review}
+@st.cache_resource(show_spinner=False)
+def get_feedback_cache():
+    """Get the process-wide LRU of recently generated (response, summary, actions) by (rating, review)"""
+    return threading.Lock(), OrderedDict()
 
-Provide only the action items as a bullet-point list. Be specific and practical.
+def recall_feedback(rating, review):
+    """Return the generated texts of an identical recent submission, if still fresh"""
+    lock, entries = get_feedback_cache()
+    key = (rating, review)
+    with lock:
+        entry = entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > FEEDBACK_CACHE_TTL:
+            return None
+        entries.move_to_end(key)
+        return entry[1]
 
-Actions:"""
+def remember_feedback(rating, review, generated):
+    """Store generated texts for a submission, evicting the least recently used beyond FEEDBACK_CACHE_SIZE"""
+    lock, entries = get_feedback_cache()
+    key = (rating, review)
+    with lock:
+        entries[key] = (time.monotonic(), generated)
+        entries.move_to_end(key)
+        while len(entries) > FEEDBACK_CACHE_SIZE:
+            entries.popitem(last=False)
 
+@st.cache_resource(show_spinner=False)
+def get_embedder():
+    """Load the review embedding model, or None when sentence-transformers is not installed or the model fails to load"""
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.6,
-            max_tokens=200
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    try:
+        return SentenceTransformer(SEMANTIC_CACHE_MODEL)
+    except Exception:
+        logger.exception("Failed to load embedding model %s", SEMANTIC_CACHE_MODEL)
+        return None
+
+def embed_review(review):
+    """Embed a review as a unit vector, or return None when no embedder is available or encoding fails"""
+    embedder = get_embedder()
+    if embedder is None:
+        return None
+    try:
+        return embedder.encode(review, normalize_embeddings=True)
+    except Exception:
+        logger.exception("Failed to embed review")
+        return None
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_index():
+    """Load the newest SEMANTIC_CACHE_SIZE unexpired review embeddings into per-rating matrices alongside their generated texts"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SEMANTIC_CACHE_TTL)
+    cursor = get_semantic_cache_collection().find(
+        {"created_at": {"$gte": cutoff}}, {"_id": 0}
+    ).sort("created_at", -1).limit(SEMANTIC_CACHE_SIZE)
+    
+    embeddings, generated = {}, {}
+    for doc in reversed(list(cursor)):
+        embeddings.setdefault(doc["rating"], []).append(doc["embedding"])
+        generated.setdefault(doc["rating"], []).append(
+            (doc["ai_response"], doc["ai_summary"], doc["ai_actions"])
         )
-        return completion.choices[0].message.content.strip()
-    except Exception as e:
-        st.warning(f"Actions generation failed: {str(e)}")
-        return "• Review and address customer feedback\n• Follow up with customer if needed"
+    
+    index = {
+        rating: (np.asarray(embeddings[rating], dtype=np.float32), generated[rating])
+        for rating in embeddings
+    }
+    return threading.Lock(), index
+
+def recall_similar_feedback(rating, embedding):
+    """Return the generated texts of the most similar stored review with the same rating, if above the threshold"""
+    lock, index = get_semantic_index()
+    with lock:
+        matrix, generated = index.get(rating, (None, []))
+        if matrix is None:
+            return None
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        return generated[best] if scores[best] >= SEMANTIC_CACHE_THRESHOLD else None
+
+def remember_similar_feedback(rating, embedding, generated):
+    """Add a review embedding and its generated texts to the in-memory index, keeping the newest SEMANTIC_CACHE_SIZE per rating, and to MongoDB"""
+    lock, index = get_semantic_index()
+    row = np.asarray(embedding, dtype=np.float32)[np.newaxis]
+    with lock:
+        matrix, texts = index.get(rating, (None, []))
+        matrix = row if matrix is None else np.vstack([matrix, row])
+        texts = texts + [generated]
+        index[rating] = (matrix[-SEMANTIC_CACHE_SIZE:], texts[-SEMANTIC_CACHE_SIZE:])
+    
+    ai_response, ai_summary, ai_actions = generated
+    ensure_indexes()
+    submit_write(get_semantic_cache_collection().insert_one, {
+        "rating": rating,
+        "embedding": row[0].tolist(),
+        "ai_response": ai_response,
+        "ai_summary": ai_summary,
+        "ai_actions": ai_actions,
+        "created_at": datetime.now(timezone.utc)
+    })
+
+def generate_feedback(rating, review, response_placeholder=None):
+    """Get the response, summary and actions for a submission, reusing an identical or near-identical one's"""
+    generated = recall_feedback(rating, review)
+    if generated is not None:
+        return generated
+    
+    embedding = embed_review(review)
+    if embedding is not None:
+        generated = recall_similar_feedback(rating, embedding)
+    
+    if generated is None:
+        generated = asyncio.run(generate_all(rating, review, response_placeholder))
+        if FALLBACK_RESPONSE in generated or FALLBACK_SUMMARY in generated:
+            return generated
+        if embedding is not None:
+            remember_similar_feedback(rating, embedding, generated)
+    
+    remember_feedback(rating, review, generated)
+    return generated
 
 def main():
     st.title("⭐ Customer Feedback System")
@@ -159,14 +353,15 @@ def main():
                 st.error("Please write a review before submitting.")
             else:
                 with st.spinner("Processing your feedback..."):
+                    status_placeholder = st.empty()
+                    response_placeholder = st.empty()
                     
-                    ai_response = generate_ai_response(rating, review)
-                    ai_summary = generate_summary(review)
-                    ai_actions = generate_actions(rating, review)
+                    ai_response, ai_summary, ai_actions = generate_feedback(
+                        rating, review, response_placeholder
+                    )
                     
                     feedback_entry = {
-                        "id": datetime.now().strftime("%Y%m%d%H%M%S%f"),
-                        "timestamp": datetime.now().isoformat(),
+                        "timestamp": datetime.now(timezone.utc),
                         "rating": rating,
                         "review": review,
                         "ai_response": ai_response,
@@ -176,8 +371,8 @@ def main():
                     
                     save_data(feedback_entry)
                     
-                    st.success("✅ Thank you for your feedback!")
-                    st.info(f"**Our Response:**\n\n{ai_response}")
+                    status_placeholder.success("✅ Thank you for your feedback!")
+                    response_placeholder.info(f"**Our Response:**\n\n{ai_response}")
                     
                     if rating >= 4:
                         st.balloons()